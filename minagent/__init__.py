@@ -4,8 +4,8 @@ A lightweight framework for building LLM agents with tool calling capabilities.
 """
 
 from .agent import Agent
-from .utils import configure_llm
+from .utils import configure_llm, configure_cache
 from .logger import set_logging
 
 __version__ = "0.1.0"
-__all__ = ["Agent", "configure_llm", "set_logging"] 
\ No newline at end of file
+__all__ = ["Agent", "configure_llm", "configure_cache", "set_logging"] 
\ No newline at end of file
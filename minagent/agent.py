@@ -1,11 +1,51 @@
 from .flow import create_agent_flow
 from .nodes import DecideAction, CallTool, ProvideAnswer
 from .logger import set_logging, get_logger
+import asyncio
+import hashlib
 import inspect
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from typing import get_type_hints
 
+# Tool metadata keyed weakly on the callable, so per-Agent closures and
+# lambdas are freed with their Agent. Values must not reference the tool.
+_tool_info_cache = weakref.WeakKeyDictionary()
+
+def _extract_tool_info(tool):
+    """Extract tool metadata (without the function itself) from a callable."""
+    name = tool.__name__
+    sig = inspect.signature(tool)
+    type_hints = getattr(tool, '__annotations__', {})
+    if any(isinstance(hint, str) for hint in type_hints.values()):
+        # Only resolve string (forward-ref) annotations when present
+        type_hints = get_type_hints(tool)
+    doc = inspect.getdoc(tool) or f"Function {name}"
+
+    params = {}
+    for param_name, param in sig.parameters.items():
+        param_type = type_hints.get(param_name, 'Any')
+        default = (
+            param.default
+            if param.default is not inspect.Parameter.empty
+            else None
+        )
+
+        params[param_name] = {
+            'type': str(param_type),
+            'default': default,
+            'kind': str(param.kind),
+        }
+
+    return {
+        'name': name,
+        'description': doc,
+        'parameters': params
+    }
+
 class Agent:
-    def __init__(self, base_prompt, tools=None, logging=False, verbose_logging=False):
+    def __init__(self, base_prompt, tools=None, logging=False, verbose_logging=False, semantic_cache=None):
         """Initialize agent with base prompt and available tools.
         
         Args:
@@ -13,49 +53,83 @@ class Agent:
             tools: List of callable functions to use as tools
             logging: Enable basic logging
             verbose_logging: Enable verbose logging (includes basic logging)
+            semantic_cache: SemanticCache instance, or True for the default one,
+                to answer near-duplicate queries without running the workflow.
+                Only consulted for queries with no prior conversation, since
+                follow-ups depend on history; entries are scoped to this
+                agent's base prompt and tools.
         """
         # Configure global logging
         set_logging(enabled=logging or verbose_logging, verbose=verbose_logging)
         self.logger = get_logger()
         self.base_prompt = base_prompt
         self.tools = tools or []
-        self.conversation_history = []
+        # Last 10 exchanges (20 messages); the only copy of the conversation
+        self._history = deque(maxlen=20)
         self.tool_call_history = []
         
+        if semantic_cache is True:
+            from .semantic_cache import SemanticCache
+            semantic_cache = SemanticCache()
+        self.semantic_cache = semantic_cache
+        
         self.tool_registry = {}
         for tool in self.tools:
             tool_info = self.register_tool(tool)
             self.tool_registry[tool_info['name']] = tool_info
+        
+        # Tools are fixed for the agent's lifetime, so render their prompt text once
+        self._tools_text = self._format_tools()
+        
+        # Semantic cache entries are only valid for this prompt and tool set
+        self._cache_scope = hashlib.sha256(f"{base_prompt}\0{self._tools_text}".encode("utf-8")).hexdigest()
+        
+        # The graph topology never changes; Flow copies nodes per run, so reuse it
+        self._flow = create_agent_flow(self.tool_registry)
 
     def register_tool(self, tool):
         """Extract metadata from a callable tool."""
-        name = tool.__name__
-        sig = inspect.signature(tool)
-        type_hints = get_type_hints(tool)
-        doc = inspect.getdoc(tool) or f"Function {name}"
-
-        params = {}
-        for param_name, param in sig.parameters.items():
-            param_type = type_hints.get(param_name, 'Any')
-            default = (
-                param.default
-                if param.default is not inspect.Parameter.empty
-                else None
-            )
-
-            params[param_name] = {
-                'type': str(param_type),
-                'default': default,
-                'kind': str(param.kind),
-            }
-
+        try:
+            info = _tool_info_cache.get(tool)
+            if info is None:
+                info = _tool_info_cache[tool] = _extract_tool_info(tool)
+        except TypeError:
+            # Unhashable or non-weakrefable callables can't be memoized
+            info = _extract_tool_info(tool)
+        
+        # Return a private copy so one Agent can't mutate another's registry
         return {
-            'name': name,
+            **info,
             'function': tool,
-            'description': doc,
-            'parameters': params
+            'parameters': {name: dict(param) for name, param in info['parameters'].items()}
         }
 
+    def _format_tools(self):
+        """Render tool descriptions for the decision prompt, sorted by name."""
+        tools_desc = []
+        for name, info in sorted(self.tool_registry.items()):
+            params_desc = []
+            for param_name, param_info in info['parameters'].items():
+                param_str = f"{param_name}: {param_info['type']}"
+                if param_info['default'] is not None:
+                    param_str += f" = {param_info['default']}"
+                params_desc.append(param_str)
+            
+            params_text = f"({', '.join(params_desc)})" if params_desc else "()"
+            tools_desc.append(f"- {name}{params_text}: {info['description']}")
+        return "\n".join(tools_desc) if tools_desc else "No tools available"
+    
+    @property
+    def conversation_history(self):
+        """Recent messages as {'role', 'content'} dicts, oldest first.
+        
+        Holds the last 10 exchanges; changes here are seen by the next run().
+        """
+        return self._history
+    
+    @conversation_history.setter
+    def conversation_history(self, messages):
+        self._history = deque(messages, maxlen=self._history.maxlen)
     
     def __call__(self, query):
         """Execute agent on a query."""
@@ -74,23 +148,10 @@ class Agent:
         self.logger.agent_start(query)
         
         # Add query to conversation history
-        self.conversation_history.append({'role': 'user', 'content': query})
+        self._history.append({'role': 'user', 'content': query})
         
-        # Create flow with current tools
-        flow = create_agent_flow(self.tool_registry)
-        
-        # Prepare shared context
-        shared = {
-            'query': query,
-            'base_prompt': self.base_prompt,
-            'conversation_history': self._get_optimized_history(),
-            'tool_registry': self.tool_registry,
-            'tool_calls': []
-        }
-        
-        # Execute flow
-        self.logger.verbose_log("Starting workflow execution")
-        flow.run(shared)
+        # Only the current query in history means this is not a follow-up
+        shared = self._execute(query, self._get_optimized_history(), standalone=len(self._history) == 1)
         
         # Extract final answer
         answer = shared.get('final_answer', 'Unable to generate response')
@@ -99,28 +160,126 @@ class Agent:
         self.logger.final_answer(answer)
         
         # Update histories
-        self.conversation_history.append({'role': 'assistant', 'content': answer})
+        self._history.append({'role': 'assistant', 'content': answer})
         self.tool_call_history.extend(shared.get('tool_calls', []))
         
         return answer
     
-    def _get_optimized_history(self):
-        """Optimize conversation history to fit context limits."""
-        # Keep last 10 exchanges (20 messages) for context
-        recent_history = self.conversation_history[-20:]
+    def _execute(self, query, history, standalone):
+        """Run the workflow for one query against a formatted history snapshot.
         
-        # Format as string for LLM context
-        if not recent_history:
-            return "No previous conversation"
+        Args:
+            query: User question or request
+            history: Formatted conversation history for the prompt
+            standalone: True if there is no prior conversation, so the answer
+                depends only on the query and the semantic cache may be used
+        
+        Returns:
+            The flow's shared context (answer in 'final_answer')
+        """
+        # Prepare shared context
+        shared = {
+            'query': query,
+            'base_prompt': self.base_prompt,
+            'conversation_history': history,
+            'tool_registry': self.tool_registry,
+            'tools_text': self._tools_text,
+            'tool_calls': [],
+            'tool_result_cache': {}
+        }
+        
+        # Answer near-duplicate standalone queries from the semantic cache
+        use_cache = self.semantic_cache is not None and standalone
+        cached, embedding = None, None
+        if use_cache:
+            cached, embedding = self.semantic_cache.lookup(query, self._cache_scope)
+        
+        if cached is not None:
+            self.logger.verbose_log("Semantic cache hit, skipping workflow")
+            shared['final_answer'] = cached
+        else:
+            # Execute flow
+            self.logger.verbose_log("Starting workflow execution")
+            self._flow.run(shared)
+            if use_cache and 'final_answer' in shared:
+                self.semantic_cache.store(embedding, shared['final_answer'], self._cache_scope)
+        
+        return shared
+    
+    async def arun(self, query):
+        """Run agent on a query without blocking the event loop.
+        
+        Like run(), this updates conversation history, so await one query
+        at a time per agent; use run_batch() for independent queries.
+        """
+        return await asyncio.to_thread(self.run, query)
+    
+    async def arun_batch(self, queries, concurrency=16, timeout=None):
+        """Answer independent queries concurrently.
+        
+        Every query sees the current conversation history, but none are
+        added to it. Flows run in worker threads sharing the pooled HTTP
+        session and response cache. A query that fails or times out gets
+        'Unable to generate response' without affecting the others.
+        
+        Args:
+            queries: Questions or requests to answer
+            concurrency: Maximum number of workflows in flight, including
+                timed-out ones still finishing in the background
+            timeout: Optional per-query limit in seconds on execution time
+                (not time spent waiting for a slot). A timed-out workflow
+                can't be interrupted; it keeps its slot until it finishes
+                and its result is discarded.
+            
+        Returns:
+            Answers in the same order as queries
+        """
+        history = self._get_optimized_history()
+        standalone = not self._history
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        # A slot is only freed when its thread is, so a query that gets a
+        # slot starts running at once and the timeout covers execution only
+        pool = ThreadPoolExecutor(max_workers=concurrency)
         
-        formatted = []
-        for msg in recent_history:
-            role = msg['role'].upper()
-            formatted.append(f"{role}: {msg['content']}")
+        def finished(future):
+            semaphore.release()
+            if not future.cancelled():
+                future.exception()  # retrieved here if nobody awaited it
         
-        return "\n".join(formatted)
+        async def answer(query):
+            await semaphore.acquire()
+            future = loop.run_in_executor(pool, self._execute, query, history, standalone)
+            future.add_done_callback(finished)
+            try:
+                # Shielded so a timeout abandons the wait, not the slot
+                shared = await asyncio.wait_for(asyncio.shield(future), timeout)
+                return shared.get('final_answer', 'Unable to generate response')
+            except asyncio.TimeoutError:
+                self.logger.error(f"Query timed out after {timeout}s: {query}")
+            except Exception as e:
+                self.logger.error(f"Query failed: {query}: {str(e)}")
+            return 'Unable to generate response'
+        
+        try:
+            return await asyncio.gather(*[answer(q) for q in queries])
+        finally:
+            pool.shutdown(wait=False)
+    
+    def run_batch(self, queries, concurrency=16, timeout=None):
+        """Answer independent queries concurrently (see arun_batch).
+        
+        Returns:
+            Answers in the same order as queries
+        """
+        return asyncio.run(self.arun_batch(queries, concurrency, timeout))
+    
+    def _get_optimized_history(self):
+        """Return the recent conversation formatted for the LLM context."""
+        lines = (f"{m['role'].upper()}: {m['content']}" for m in self._history)
+        return "\n".join(lines) or "No previous conversation"
     
     def clear_history(self):
         """Clear conversation and tool call history."""
-        self.conversation_history = []
+        self._history.clear()
         self.tool_call_history = []
\ No newline at end of file
@@ -1,8 +1,29 @@
 """Logging utilities for MinAgent framework."""
 
-import json
+import sys
+import functools
+import orjson
 from typing import Any
 
+_dumps = orjson.dumps
+_DUMPS_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+def _enabled_only(fn):
+    """Skip the call unless logging is enabled."""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if self.enabled:
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+def _verbose_only(fn):
+    """Skip the call unless verbose logging is enabled."""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if self.verbose:
+            return fn(self, *args, **kwargs)
+    return wrapper
+
 class Colors:
     """ANSI color codes for terminal output."""
     RESET = '\033[0m'
@@ -18,6 +39,16 @@ class Colors:
     CYAN = '\033[96m'
     WHITE = '\033[97m'
     GRAY = '\033[90m'
+    
+    BAR = '=' * 50
+
+PALETTE = (Colors.RED, Colors.GREEN, Colors.YELLOW, Colors.BLUE,
+           Colors.MAGENTA, Colors.CYAN, Colors.WHITE, Colors.GRAY)
+
+def _section_parts(color: str):
+    """Build the (prefix, suffix) framing a section title in color."""
+    rule = f"{color}{Colors.BOLD}{Colors.BAR}{Colors.RESET}"
+    return f"\n{rule}\n{color}{Colors.BOLD}  ", f"{Colors.RESET}\n{rule}\n"
 
 class Logger:
     """Beautiful logger for agent operations."""
@@ -25,6 +56,7 @@ class Logger:
     def __init__(self, enabled=False, verbose=False):
         self.enabled = enabled
         self.verbose = verbose
+        self._section_tpl = {c: _section_parts(c) for c in PALETTE}
     
     def _format_content(self, content: str, max_length: int = 100) -> str:
         """Format content - always return full content."""
@@ -35,12 +67,11 @@ class Logger:
         if not self.enabled:
             return
             
-        print(f"\n{color}{Colors.BOLD}{'=' * 50}{Colors.RESET}")
-        print(f"{color}{Colors.BOLD}  {title}{Colors.RESET}")
-        print(f"{color}{Colors.BOLD}{'=' * 50}{Colors.RESET}")
-        
+        prefix, suffix = self._section_tpl.get(color) or _section_parts(color)
+        out = prefix + title + suffix
         if content:
-            print(f"{Colors.WHITE}{content}{Colors.RESET}")
+            out += f"{Colors.WHITE}{content}{Colors.RESET}\n"
+        sys.stdout.write(out)
     
     def _print_item(self, label: str, value: Any, color: str = Colors.CYAN):
         """Print a labeled item."""
@@ -48,82 +79,68 @@ class Logger:
             return
             
         if isinstance(value, (dict, list)):
-            value_str = json.dumps(value, indent=2)
+            value_str = _dumps(value, default=str, option=_DUMPS_OPTIONS).decode("utf-8")
         else:
             value_str = str(value)
             
         formatted_value = self._format_content(value_str)
         print(f"{color}{Colors.BOLD}{label}:{Colors.RESET} {formatted_value}")
     
+    @_enabled_only
     def agent_start(self, query: str):
         """Log agent execution start."""
-        if not self.enabled:
-            return
-            
         self._print_section("🤖 AGENT EXECUTION", Colors.BLUE)
         self._print_item("Query", query, Colors.WHITE)
     
+    @_enabled_only
     def llm_call(self, prompt: str, response: str):
         """Log LLM input/output."""
-        if not self.enabled:
-            return
-            
         self._print_section("🧠 LLM CALL", Colors.MAGENTA)
         self._print_item("Input", prompt, Colors.GRAY)
         self._print_item("Output", response, Colors.WHITE)
     
+    @_enabled_only
     def tool_call(self, tool_name: str, args: dict, result: str):
         """Log tool execution."""
-        if not self.enabled:
-            return
-            
         self._print_section(f"🔧 TOOL: {tool_name}", Colors.GREEN)
         if args:
             self._print_item("Arguments", args, Colors.YELLOW)
         self._print_item("Result", result, Colors.WHITE)
     
+    @_enabled_only
     def decision(self, action: str, details: dict):
         """Log agent decision."""
-        if not self.enabled:
-            return
-            
         icon = "🔧" if action == "tool" else "✅"
         self._print_section(f"{icon} DECISION: {action.upper()}", Colors.CYAN)
         
-        if action == "tool":
+        if action == "tool" and details.get('tool_calls'):
+            self._print_item("Tools", details['tool_calls'])
+        elif action == "tool":
             self._print_item("Tool", details.get('tool_name', 'Unknown'))
             if details.get('tool_args'):
                 self._print_item("Args", details['tool_args'])
         else:
             self._print_item("Answer", details.get('final_answer', 'No answer'))
     
+    @_enabled_only
     def final_answer(self, answer: str):
         """Log final answer."""
-        if not self.enabled:
-            return
-            
         self._print_section("✨ FINAL ANSWER", Colors.GREEN)
         print(f"{Colors.WHITE}{answer}{Colors.RESET}")
     
+    @_verbose_only
     def verbose_log(self, message: str, color: str = Colors.GRAY):
         """Log verbose workflow messages."""
-        if not self.verbose:
-            return
-            
         print(f"{color}{Colors.DIM}→ {message}{Colors.RESET}")
     
+    @_enabled_only
     def error(self, message: str):
         """Log error messages."""
-        if not self.enabled:
-            return
-            
         print(f"{Colors.RED}{Colors.BOLD}❌ ERROR: {message}{Colors.RESET}")
     
+    @_verbose_only
     def workflow_step(self, step: str, details: str = None):
         """Log workflow step entry."""
-        if not self.verbose:
-            return
-            
         print(f"\n{Colors.BLUE}{Colors.DIM}📍 {step}{Colors.RESET}")
         if details:
             print(f"{Colors.GRAY}{Colors.DIM}   {details}{Colors.RESET}")
@@ -132,9 +149,12 @@ class Logger:
 _logger = Logger()
 
 def set_logging(enabled: bool, verbose: bool = False):
-    """Configure global logging settings."""
-    global _logger
-    _logger = Logger(enabled, verbose)
+    """Configure global logging settings.
+    
+    Updates the shared instance in place so module-level references stay valid.
+    """
+    _logger.enabled = enabled
+    _logger.verbose = verbose
 
 def get_logger() -> Logger:
     """Get the global logger instance."""
@@ -1,97 +1,206 @@
 from minllm import Node
-from .utils import call_llm
+from .utils import call_llm_stream, uncache
 from .logger import get_logger
-import yaml
-import json
+import functools
+import re
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared logger; set_logging() updates it in place
+logger = get_logger()
+
+# Fallback for models that ignore JSON mode and wrap the object in a fence
+_JSON_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+def _parse_decision(response):
+    """Parse the JSON decision, accepting bare, fenced or prose-wrapped JSON."""
+    try:
+        return orjson.loads(response)
+    except orjson.JSONDecodeError:
+        m = _JSON_RE.search(response)
+        if m:
+            return orjson.loads(m.group(1))
+        # Last resort: the outermost braces, e.g. after "Here is my decision:"
+        start, end = response.find("{"), response.rfind("}")
+        if start == -1 or end < start:
+            raise
+        return orjson.loads(response[start:end + 1])
+
+def _early_decision(partial):
+    """Return a complete tool decision from a partial JSON response, or None.
+    
+    Closes the object right after the last complete value; if that parses
+    into a tool action with its calls fully received, the rest of the
+    stream (closing fence, trailing fields) is not needed to route.
+    A single tool_name/tool_args call is only final once a tool_calls list
+    can no longer follow: the key already went by, a later key
+    (final_answer) started, or the object closed.
+    """
+    if '"tool_args"' not in partial and '"tool_calls"' not in partial:
+        return None
+    start = partial.find("{")
+    end = max(partial.rfind("}"), partial.rfind("]"))
+    if start == -1 or end <= start:
+        return None
+    body = partial[start:end + 1]
+    closed = True
+    try:
+        decision = orjson.loads(body)  # the object itself just closed
+    except orjson.JSONDecodeError:
+        closed = False
+        try:
+            decision = orjson.loads(body + "}")
+        except orjson.JSONDecodeError:
+            return None
+    if not isinstance(decision, dict) or decision.get('action') != 'tool':
+        return None
+    if decision.get('tool_calls'):
+        return decision
+    if decision.get('tool_name') and 'tool_args' in decision:
+        if closed or 'tool_calls' in decision or '"final_answer"' in partial[end + 1:]:
+            return decision
+    return None
+
+TOOL_HISTORY_BUDGET = 1500  # tokens
+
+@functools.lru_cache(maxsize=1)
+def _get_encoder():
+    """Return a tiktoken encoder, or None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def _count_tokens(text):
+    """Count tokens with tiktoken, or estimate ~4 characters per token."""
+    encoder = _get_encoder()
+    return len(encoder.encode(text)) if encoder else len(text) // 4 + 1
+
+def _truncate_tokens(text, budget):
+    """Cut text down to roughly budget tokens."""
+    encoder = _get_encoder()
+    if encoder:
+        return encoder.decode(encoder.encode(text)[:budget]) + " ..."
+    return text[:budget * 4] + " ..."
+
+def _pack_tool_history(tool_calls, budget_tokens=TOOL_HISTORY_BUDGET):
+    """Render tool calls newest-first into a token budget, eliding older ones."""
+    # Collapse repeated identical calls, keeping the most recent
+    unique = {}
+    for call in tool_calls:
+        key = _call_key(call['tool'], call['args'])
+        unique.pop(key, None)
+        unique[key] = call
+    calls = list(unique.items())
+
+    lines, used = [], 0
+    for (tool, args), call in reversed(calls):
+        # Args tell apart results of the same tool, e.g. in a batch
+        line = f"- {tool}({args.decode()}): {call['result']}"
+        cost = _count_tokens(line)
+        if used + cost > budget_tokens:
+            if not lines:
+                # Always show the newest result, cut to the budget
+                lines.append(_truncate_tokens(line, budget_tokens))
+            break
+        lines.append(line)
+        used += cost
+
+    elided = len(calls) - len(lines)
+    if elided:
+        lines.append(f"... {elided} earlier tool calls elided ...")
+    return "\n".join(reversed(lines))
 
 class DecideAction(Node):
     def prep(self, shared):
         """Prepare context for decision-making."""
-        logger = get_logger()
         logger.workflow_step("DecideAction.prep", "Preparing decision context")
         
         return {
             'query': shared['query'],
             'base_prompt': shared['base_prompt'],
             'conversation_history': shared['conversation_history'],
-            'tool_registry': shared['tool_registry'],
+            'tools_text': shared['tools_text'],
             'tool_calls': shared['tool_calls']
         }
         
     def exec(self, inputs):
         """Decide next action: call a tool or provide final answer."""
-        logger = get_logger()
         logger.workflow_step("DecideAction.exec", "Making decision")
         
-        # Build tool descriptions
-        tools_desc = []
-        for name, info in inputs['tool_registry'].items():
-            params_desc = []
-            for param_name, param_info in info.get('parameters', {}).items():
-                param_type = param_info['type']
-                default = param_info.get('default')
-                param_str = f"{param_name}: {param_type}"
-                if default is not None:
-                    param_str += f" = {default}"
-                params_desc.append(param_str)
-            
-            params_text = f"({', '.join(params_desc)})" if params_desc else "()"
-            tools_desc.append(f"- {name}{params_text}: {info['description']}")
-        tools_text = "\n".join(tools_desc) if tools_desc else "No tools available"
-        
         # Build previous tool calls summary
         tool_history = ""
         if inputs['tool_calls']:
-            calls = []
-            for call in inputs['tool_calls'][-5:]:  # Last 5 tool calls
-                calls.append(f"- {call['tool']}: {call['result']}")
-            tool_history = "\nRecent Tool Calls:\n" + "\n".join(calls)
+            tool_history = "\nRecent Tool Calls:\n" + _pack_tool_history(inputs['tool_calls'])
         
-        prompt = f"""### SYSTEM
+        # Stable prefix first (cacheable by the provider), per-turn content after
+        system = f"""### SYSTEM
 {inputs['base_prompt']}
 
-### CONVERSATION HISTORY
+### AVAILABLE TOOLS
+{inputs['tools_text']}
+
+### DECISION
+Decide the next action. You can either:
+1. Call a tool to gather information
+2. Call several independent tools at once using tool_calls
+3. Provide the final answer if you have sufficient information
+
+Return your decision as a single JSON object:
+
+{{
+    "thinking": "<step-by-step reasoning about what to do next>",
+    "action": "tool" or "answer",
+    "tool_calls": [{{"tool_name": "<name of tool>", "tool_args": {{<arguments>}}}}, ...],
+    "tool_name": "<name of tool if action is tool>",
+    "tool_args": {{<arguments for tool if action is tool>}},
+    "final_answer": "<complete answer if action is answer>"
+}}
+
+Use "tool_calls" only to call several independent tools at once; otherwise set it to [] and use "tool_name"/"tool_args".
+"""
+        
+        prompt = f"""### CONVERSATION HISTORY
 {inputs['conversation_history']}
 
 ### CURRENT QUERY
 {inputs['query']}
-
-### AVAILABLE TOOLS
-{tools_text}
 {tool_history}
 
-### DECISION
-Decide the next action. You can either:
-1. Call a tool to gather information
-2. Provide the final answer if you have sufficient information
-
-Return your decision in YAML format:
-
-```yaml
-thinking: |
-    <step-by-step reasoning about what to do next>
-action: tool OR answer
-tool_name: <name of tool if action is tool>
-tool_args: <arguments for tool as a dict if action is tool>
-final_answer: |
-    <complete answer if action is answer>
-```
+Decide the next action and return it as the JSON object described above.
 """
         
-        response = call_llm(prompt)
+        # Stream the decision and stop as soon as a tool call is complete
+        chunks, decision = [], None
+        params = {'response_format': {"type": "json_object"}}
+        stream = call_llm_stream(prompt, system=system, **params)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                # A value closing or a new key starting can complete the tool call
+                if '}' in chunk or ']' in chunk or '"' in chunk:
+                    decision = _early_decision("".join(chunks))
+                    if decision:
+                        break
+        finally:
+            stream.close()
+        response = "".join(chunks)
         
         # Log LLM call
-        logger.llm_call(prompt, response)
-        
-        # Extract YAML
-        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
-        decision = yaml.safe_load(yaml_str)
+        logger.llm_call(f"{system}\n{prompt}", response)
         
-        return decision
+        if decision:
+            return decision
+        try:
+            return _parse_decision(response)
+        except orjson.JSONDecodeError:
+            # Don't let retries replay a malformed response from the cache
+            uncache(prompt, system=system, **params)
+            raise
     
     def post(self, shared, prep_res, exec_res):
         """Save decision and route to next node."""
-        logger = get_logger()
         logger.workflow_step("DecideAction.post", "Processing decision")
         
         shared['last_decision'] = exec_res
@@ -105,67 +214,109 @@ final_answer: |
             shared['final_answer'] = exec_res['final_answer']
             return 'answer'
 
+def _call_key(tool_name, tool_args):
+    """Identify a tool call by name and canonicalized arguments."""
+    return tool_name, orjson.dumps(tool_args, option=orjson.OPT_SORT_KEYS, default=str)
+
+def _run_tool(call):
+    """Execute a single resolved tool call.
+    
+    Returns:
+        (result string, True on success / False on error)
+    """
+    tool_func, tool_name, tool_args, _ = call
+
+    if tool_func is None:
+        error_msg = f"Error: Tool '{tool_name}' not found"
+        logger.error(error_msg)
+        return error_msg, False
+
+    try:
+        # Call tool with arguments
+        if isinstance(tool_args, dict):
+            result = tool_func(**tool_args)
+        else:
+            result = tool_func(tool_args)
+
+        result_str = str(result)
+
+        # Log tool call
+        logger.tool_call(tool_name, tool_args, result_str)
+
+        return result_str, True
+    except Exception as e:
+        error_msg = f"Error calling {tool_name}: {str(e)}"
+        logger.error(error_msg)
+        return error_msg, False
+
+def _run_all(calls):
+    """Run independent blocking tool calls concurrently in worker threads.
+    
+    Uses threads rather than an event loop so it also works when the agent
+    is called from async code (e.g. Jupyter).
+    """
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(_run_tool, calls))
+
 class CallTool(Node):
     def prep(self, shared):
-        """Prepare tool call from decision."""
-        logger = get_logger()
+        """Prepare tool call(s) from decision."""
         logger.workflow_step("CallTool.prep", "Preparing tool execution")
         
         decision = shared['last_decision']
-        tool_name = decision['tool_name']
-        tool_args = decision.get('tool_args', {})
-        
-        # Get tool function
+        tool_calls = decision.get('tool_calls') or [decision]
+        calls = [self._resolve(shared, c['tool_name'], c.get('tool_args', {})) for c in tool_calls]
+        return calls, shared['tool_result_cache']
+    
+    def _resolve(self, shared, tool_name, tool_args):
+        """Look up a tool function by name."""
+        key = _call_key(tool_name, tool_args)
         tool_info = shared['tool_registry'].get(tool_name)
         if not tool_info:
             logger.error(f"Tool '{tool_name}' not found in registry")
-            return None, tool_name, tool_args
+            return None, tool_name, tool_args, key
             
-        return tool_info['function'], tool_name, tool_args
+        return tool_info['function'], tool_name, tool_args, key
         
     def exec(self, inputs):
-        """Execute the tool with provided arguments."""
-        logger = get_logger()
-        tool_func, tool_name, tool_args = inputs
+        """Execute the tool(s) with provided arguments, reusing results from this run."""
+        calls, cache = inputs
         
-        logger.workflow_step("CallTool.exec", f"Executing tool: {tool_name}")
+        # Identical calls (earlier in the run or within this batch) execute once
+        pending = {}
+        for call in calls:
+            if call[3] in cache:
+                logger.verbose_log(f"Reusing cached result for {call[1]}")
+            else:
+                pending.setdefault(call[3], call)
         
-        if tool_func is None:
-            error_msg = f"Error: Tool '{tool_name}' not found"
-            logger.error(error_msg)
-            return error_msg
+        fresh = {}
+        if len(pending) > 1:
+            names = ", ".join(call[1] for call in pending.values())
+            logger.workflow_step("CallTool.exec", f"Executing {len(pending)} tools in parallel: {names}")
+            fresh = dict(zip(pending, _run_all(list(pending.values()))))
+        elif pending:
+            key, call = next(iter(pending.items()))
+            logger.workflow_step("CallTool.exec", f"Executing tool: {call[1]}")
+            fresh = {key: _run_tool(call)}
         
-        try:
-            # Call tool with arguments
-            if isinstance(tool_args, dict):
-                result = tool_func(**tool_args)
-            else:
-                result = tool_func(tool_args)
-            
-            result_str = str(result)
-            
-            # Log tool call
-            logger.tool_call(tool_name, tool_args, result_str)
-            
-            return result_str
-        except Exception as e:
-            error_msg = f"Error calling {tool_name}: {str(e)}"
-            logger.error(error_msg)
-            return error_msg
+        return [fresh[call[3]] if call[3] in fresh else (cache[call[3]], True) for call in calls]
     
     def post(self, shared, prep_res, exec_res):
-        """Save tool result and return to decision node."""
-        logger = get_logger()
+        """Save tool result(s) and return to decision node."""
         logger.workflow_step("CallTool.post", "Recording tool result")
         
-        tool_func, tool_name, tool_args = prep_res
+        calls, cache = prep_res
         
-        # Record tool call
-        shared['tool_calls'].append({
-            'tool': tool_name,
-            'args': tool_args,
-            'result': exec_res
-        })
+        # Record tool calls
+        for (tool_func, tool_name, tool_args, key), (result, ok) in zip(calls, exec_res):
+            if ok:
+                cache[key] = result
+            shared['tool_calls'].append({
+                'tool': tool_name,
+                'args': tool_args,
+                'result': result
+            })
         
         logger.verbose_log(f"Tool call recorded, returning to decision node")
         
@@ -175,18 +326,15 @@ class CallTool(Node):
 class ProvideAnswer(Node):
     def prep(self, shared):
         """Get final answer from shared context."""
-        logger = get_logger()
         logger.workflow_step("ProvideAnswer.prep", "Preparing final answer")
         return shared.get('final_answer', 'No answer generated')
         
     def exec(self, answer):
         """Return the final answer."""
-        logger = get_logger()
         logger.workflow_step("ProvideAnswer.exec", "Finalizing answer")
         return answer
     
     def post(self, shared, prep_res, exec_res):
         """Mark completion."""
-        logger = get_logger()
         logger.workflow_step("ProvideAnswer.post", "Workflow complete")
         return 'done' 
@@ -0,0 +1,78 @@
+"""Semantic response cache for MinAgent.
+
+Answers are keyed on query embeddings so rephrased questions
+("capital of France" vs "France's capital") reuse a previous answer.
+Entries are partitioned by a scope (Agent uses its base prompt and tools),
+so one cache can be shared between different agents safely.
+Requires numpy, plus sentence-transformers for the default embedder.
+"""
+
+import threading
+import numpy as np
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+class SemanticCache:
+    """Cache answers by cosine similarity of query embeddings."""
+
+    def __init__(self, threshold=0.92, embed=None, model=DEFAULT_MODEL):
+        """Create an empty cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            embed: Callable mapping a string to a 1-D vector (defaults to a
+                local sentence-transformers model, loaded on first use)
+            model: Model name for the default embedder
+        """
+        self.threshold = threshold
+        self.model = model
+        self._embed = embed
+        self._entries = {}  # scope -> (embedding matrix, answers)
+        self._lock = threading.Lock()  # keeps matrix rows and answers aligned
+
+    def embed(self, text):
+        """Return the unit-normalized embedding of text."""
+        if self._embed is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._embed = SentenceTransformer(self.model).encode
+        vec = np.asarray(self._embed(text), dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, query, scope=None):
+        """Find a cached answer for query among entries stored under scope.
+
+        Returns:
+            (answer or None, query embedding) - pass the embedding to store()
+            on a miss to avoid embedding the query twice
+        """
+        vec = self.embed(query)
+        with self._lock:
+            matrix, answers = self._entries.get(scope, (None, None))
+        if matrix is None:
+            return None, vec
+
+        # Rows are unit vectors, so one matmul gives every cosine similarity
+        scores = matrix @ vec
+        best = int(scores.argmax())
+        if scores[best] >= self.threshold:
+            return answers[best], vec
+        return None, vec
+
+    def store(self, embedding, answer, scope=None):
+        """Add an (embedding, answer) pair to the cache under scope."""
+        row = embedding[None, :]
+        with self._lock:
+            matrix, answers = self._entries.get(scope, (None, []))
+            matrix = row if matrix is None else np.vstack([matrix, row])
+            answers.append(answer)
+            self._entries[scope] = (matrix, answers)
+
+    def clear(self):
+        """Remove all cached answers."""
+        with self._lock:
+            self._entries = {}
+
+    def __len__(self):
+        return sum(len(answers) for _, answers in self._entries.values())
@@ -1,100 +1,144 @@
 import os
+import time
+import json
+import hashlib
+import functools
+import threading
+import orjson
+from collections import OrderedDict
+from contextlib import closing
+from .logger import get_logger
 
-def call_llm_openai(prompt, client, model, params={}):    
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:  # only needed for the OpenRouter provider
+    requests = None
+
+# Shared logger; set_logging() updates it in place
+logger = get_logger()
+
+def _build_messages(prompt, system=None, cache_system=False):
+    """Build chat messages with an optional (cacheable) system prefix."""
+    messages = []
+    if system:
+        if cache_system:
+            content = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        else:
+            content = system
+        messages.append({"role": "system", "content": content})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def call_llm_openai(prompt, client, model, params={}, system=None):    
     """Call OpenAI LLM without streaming."""
     r = client.chat.completions.create(
         model=model,
-        messages=[{"role": "user", "content": prompt}],
+        messages=_build_messages(prompt, system),
         stream=False,
         **params
     )
     return r.choices[0].message.content
 
-def call_llm_openai_stream(prompt, client, model, params={}):
+def call_llm_openai_stream(prompt, client, model, params={}, system=None):
     """Call OpenAI LLM with streaming."""
-    s = client.chat.completions.create(
+    # The context manager closes the response when the caller stops early
+    with client.chat.completions.create(
         model=model,
-        messages=[{"role": "user", "content": prompt}],
+        messages=_build_messages(prompt, system),
         stream=True,
         **params
-    )
-    
-    for chunk in s:
-        if chunk.choices[0].delta.content is not None:
-            yield chunk.choices[0].delta.content
+    ) as s:
+        for chunk in s:
+            if chunk.choices[0].delta.content is not None:
+                yield chunk.choices[0].delta.content
 
-def call_llm_openrouter(api_key, prompt, model, params={}):
-    """Call OpenRouter LLM without streaming."""
-    import requests
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+_OPENROUTER_HEADERS = {"Content-Type": "application/json"}
+_HTTP_TIMEOUT = 60
+_HTTP_POOL_SIZE = 32
 
-    r = requests.post(
-        url="https://openrouter.ai/api/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        },
+# Shared HTTP session so connections (and TLS sessions) are reused across calls
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    """Return the shared pooled HTTP session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                if requests is None:
+                    raise ImportError("The OpenRouter provider requires the 'requests' package")
+                session = requests.Session()
+                session.headers.update(_OPENROUTER_HEADERS)
+                session.mount("https://", HTTPAdapter(pool_connections=_HTTP_POOL_SIZE, pool_maxsize=_HTTP_POOL_SIZE))
+                _session = session
+    return _session
+
+@functools.lru_cache(maxsize=None)
+def _auth_headers(api_key):
+    """Build the per-key request headers once."""
+    return {"Authorization": f"Bearer {api_key}"}
+
+def _cache_system(model):
+    """Anthropic models need explicit cache_control breakpoints for prompt caching."""
+    return model.startswith("anthropic/")
+
+def call_llm_openrouter(api_key, prompt, model, params={}, system=None):
+    """Call OpenRouter LLM without streaming."""
+    r = _get_session().post(
+        OPENROUTER_URL,
+        headers=_auth_headers(api_key),
         json={
             "model": model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            "messages": _build_messages(prompt, system, _cache_system(model)),
             **params
-        }
+        },
+        timeout=_HTTP_TIMEOUT
     )
     r = r.json()
     return r["choices"][0]["message"]["content"]
 
-def call_llm_openrouter_stream(api_key, prompt, model, params={}):
+def call_llm_openrouter_stream(api_key, prompt, model, params={}, system=None):
     """Call OpenRouter LLM with streaming."""
-    import requests
-    import json
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
     payload = {
         "model": model,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": _build_messages(prompt, system, _cache_system(model)),
         "stream": True,
         **params
     }
 
-    with requests.post(url, headers=headers, json=payload, stream=True) as r:
-        buffer = ""
-        for chunk in r.iter_content(chunk_size=1024, decode_unicode=True):
-            if chunk:
-                buffer += chunk
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    line = line.strip()
-                    
-                    if line.startswith('data: '):
-                        data = line[6:]
-                        if data == '[DONE]':
-                            return
-                        
-                        try:
-                            data_obj = json.loads(data)
-                            if "choices" in data_obj and len(data_obj["choices"]) > 0:
-                                delta = data_obj["choices"][0].get("delta", {})
-                                content = delta.get("content")
-                                if content:
-                                    yield content
-                        except json.JSONDecodeError:
-                            continue
+    session = _get_session()
+    with session.post(OPENROUTER_URL, headers=_auth_headers(api_key), json=payload,
+                      stream=True, timeout=_HTTP_TIMEOUT) as r:
+        # Split on raw bytes and only decode the JSON payload of data lines
+        for line in r.iter_lines(chunk_size=65536):
+            if not line.startswith(b"data: "):
+                continue
+            data = line[6:]
+            if data == b"[DONE]":
+                return
+            
+            try:
+                data_obj = orjson.loads(data)
+            except orjson.JSONDecodeError:
+                continue
+            choices = data_obj.get("choices")
+            if choices:
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
 
 # Default LLM configuration
 _llm_config = {
     'provider': 'openrouter',
     'api_key': None,
     'model': 'anthropic/claude-3.5-sonnet',
-    'client': None
+    'client': None,
+    # Provider calls specialized to this config, built on first use
+    '_call': None,
+    '_stream': None
 }
 
 def configure_llm(provider='openrouter', api_key=None, model=None, client=None):
@@ -113,46 +157,196 @@ def configure_llm(provider='openrouter', api_key=None, model=None, client=None):
         _llm_config['model'] = model
     if client:
         _llm_config['client'] = client
+    _llm_config['_call'] = _llm_config['_stream'] = None
+
+def _build_call(stream=False):
+    """Bind the configured provider, credentials and model into single callables.
+    
+    Returns:
+        The streaming callable if stream is True, else the blocking one
+    """
+    provider = _llm_config['provider']
+    model = _llm_config['model']
+    if provider == 'openai':
+        client = _llm_config['client']
+        if not client:
+            raise ValueError("OpenAI client not configured. Use configure_llm()")
+        call = functools.partial(call_llm_openai, client=client, model=model)
+        call_stream = functools.partial(call_llm_openai_stream, client=client, model=model)
+    elif provider == 'openrouter':
+        api_key = _llm_config['api_key'] or os.getenv('OPENROUTER_API_KEY')
+        if not api_key:
+            raise ValueError("OpenRouter API key not configured")
+        call = functools.partial(call_llm_openrouter, api_key, model=model)
+        call_stream = functools.partial(call_llm_openrouter_stream, api_key, model=model)
+    else:
+        raise ValueError(f"Unknown provider: {provider}")
+    
+    _llm_config['_call'] = call
+    _llm_config['_stream'] = call_stream
+    return call_stream if stream else call
+
+class _ResponseCache:
+    """In-memory LRU of LLM responses with an optional TTL (seconds)."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()  # shared by concurrent flows
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
 
-def call_llm(prompt, **params):
+class _DiskResponseCache:
+    """Persistent response cache backed by diskcache."""
+
+    def __init__(self, directory, ttl=None, size_limit=2**30):
+        import diskcache
+
+        self.ttl = ttl
+        # diskcache bounds the store by bytes, culling least recently used
+        self._cache = diskcache.Cache(os.path.expanduser(directory),
+                                      size_limit=size_limit,
+                                      eviction_policy='least-recently-used')
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value, expire=self.ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+# Exact-match cache for deterministic LLM calls (None disables caching)
+_response_cache = _ResponseCache()
+
+def configure_cache(enabled=True, maxsize=1024, ttl=None, directory=None, size_limit=2**30):
+    """Configure the exact-match LLM response cache.
+    
+    Only deterministic calls (temperature 0 or unset) are cached.
+    
+    Args:
+        enabled: Turn the cache on or off
+        maxsize: Maximum number of in-memory entries (ignored with directory)
+        ttl: Optional entry lifetime in seconds
+        directory: Persist entries on disk here (requires diskcache)
+        size_limit: Maximum size of the disk cache in bytes
+    """
+    global _response_cache
+    if not enabled:
+        _response_cache = None
+    elif directory:
+        _response_cache = _DiskResponseCache(directory, ttl, size_limit)
+    else:
+        _response_cache = _ResponseCache(maxsize, ttl)
+
+def _cache_key(prompt, system, params):
+    """Hash everything that determines the response."""
+    raw = "\0".join([
+        _llm_config['provider'],
+        _llm_config['model'],
+        json.dumps(params, sort_keys=True, default=str),
+        system or "",
+        prompt
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def uncache(prompt, system=None, **params):
+    """Drop the cached response for a call, e.g. one the caller failed to parse.
+    
+    Takes the same arguments as call_llm(), so a rejected response is not
+    replayed on the next identical call.
+    """
+    cache = _response_cache
+    if cache is not None:
+        cache.delete(_cache_key(prompt, system, params))
+
+def call_llm(prompt, system=None, **params):
     """Call the configured LLM with the given prompt.
     
     Args:
         prompt: Text prompt for the LLM
+        system: Optional stable system prefix, sent first so providers can cache it
         **params: Additional parameters for the LLM
         
     Returns:
         LLM response as string
     """
-    provider = _llm_config['provider']
+    cache = _response_cache if params.get('temperature', 0) == 0 else None
+    if cache is not None:
+        key = _cache_key(prompt, system, params)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
     
     try:
-        if provider == 'openai':
-            if not _llm_config['client']:
-                raise ValueError("OpenAI client not configured. Use configure_llm()")
-            response = call_llm_openai(
-                prompt, 
-                _llm_config['client'], 
-                _llm_config['model'],
-                params
-            )
-        elif provider == 'openrouter':
-            api_key = _llm_config['api_key'] or os.getenv('OPENROUTER_API_KEY')
-            if not api_key:
-                raise ValueError("OpenRouter API key not configured")
-            response = call_llm_openrouter(
-                api_key,
-                prompt,
-                _llm_config['model'],
-                params
-            )
-        else:
-            raise ValueError(f"Unknown provider: {provider}")
+        call = _llm_config['_call'] or _build_call()
+        response = call(prompt, params=params, system=system)
         
+        if cache is not None:
+            cache.set(key, response)
         return response
         
     except Exception as e:
-        from .logger import get_logger
-        logger = get_logger()
         logger.error(f"LLM call failed: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def call_llm_stream(prompt, system=None, **params):
+    """Stream the configured LLM's response to the given prompt.
+    
+    Closing the generator early stops the underlying request. Only fully
+    consumed responses are stored in the response cache; call uncache()
+    if the response turns out to be unusable.
+    
+    Args:
+        prompt: Text prompt for the LLM
+        system: Optional stable system prefix, sent first so providers can cache it
+        **params: Additional parameters for the LLM
+        
+    Yields:
+        Response text chunks
+    """
+    cache = _response_cache if params.get('temperature', 0) == 0 else None
+    if cache is not None:
+        key = _cache_key(prompt, system, params)
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    
+    chunks = []
+    try:
+        call_stream = _llm_config['_stream'] or _build_call(stream=True)
+        with closing(call_stream(prompt, params=params, system=system)) as stream:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+    except Exception as e:
+        logger.error(f"LLM call failed: {str(e)}")
+        raise
+    
+    if cache is not None:
+        cache.set(key, "".join(chunks))